@@ -0,0 +1,41 @@
+"""Переключатели избранного, корзины и подписки для ASGI.
+
+В Django 3.2 нет асинхронного ORM, а sync_to_async по умолчанию
+(thread_sensitive=True) выполняет весь синхронный код воркера в одном
+потоке, и запросы идут по очереди. Здесь обычный view DRF целиком —
+аутентификация, работа с базой и рендеринг — выполняется одним вызовом
+в пуле потоков цикла событий, поэтому запросы обрабатываются
+параллельно. Django 3.2 не поддерживает асинхронные методы в
+классах-view, поэтому обёртка — функция.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .views import FavoriteView, ShoppingCartView, SubscriptionView
+
+
+def async_view(view):
+    """Асинхронная обёртка синхронного view для работы в пуле потоков."""
+
+    def handle(request, **kwargs):
+        # Соединения с базой у каждого потока пула свои, и сигналы
+        # начала и конца запроса их не затрагивают.
+        close_old_connections()
+        try:
+            return view(request, **kwargs).render()
+        finally:
+            close_old_connections()
+
+    handle_in_thread = sync_to_async(handle, thread_sensitive=False)
+
+    async def wrapper(request, **kwargs):
+        return await handle_in_thread(request, **kwargs)
+
+    # csrf_exempt в Django 3.2 превращает функцию в синхронную.
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+favorite = async_view(FavoriteView.as_view())
+shopping_cart = async_view(ShoppingCartView.as_view())
+subscription = async_view(SubscriptionView.as_view())
@@ -0,0 +1,24 @@
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешем: при попадании в кеш запросов к БД нет.
+
+    Проверки активности пользователя и существования токена выполняет
+    родительский класс при промахе; записи кеша сбрасываются при
+    удалении токена (logout) и изменении пользователя. Без общего кеша
+    Django сброс не дошёл бы до других воркеров, поэтому кеш не
+    используется.
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache.enabled():
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
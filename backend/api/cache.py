@@ -0,0 +1,220 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.constants import (
+    AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL, PAYLOAD_CACHE_SIZE,
+    REFERENCE_CACHE_MAX_AGE
+)
+from foodgram.versions import cache_is_shared, get_version, version_key
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+RECIPE_KEY = 'recipe_representation:{}'
+TOKEN_KEY = 'auth_token:{}'
+
+
+class PayloadCache:
+    """LRU-кеш готовых данных ответа в памяти воркера."""
+
+    def __init__(self, max_size=PAYLOAD_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def get(self, key, version):
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is None or cached[0] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return cached[1]
+
+    def set(self, key, version, payload):
+        with self._lock:
+            self._data[key] = (version, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+payload_cache = PayloadCache()
+
+
+class RecipeCache:
+    """Общая для всех пользователей часть представления рецепта.
+
+    Запись хранит версии рецепта, его автора, тегов и ингредиентов и
+    считается актуальной, пока ни одна из них не изменилась. Поля,
+    зависящие от пользователя, в кеш не попадают. Изменения из других
+    процессов видны только через общий кеш Django, поэтому с локальным
+    кешем процесса RecipeCache не используется. Ссылки на изображения
+    хранятся без схемы и хоста и дополняются по текущему запросу.
+    """
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    @staticmethod
+    def enabled():
+        return cache_is_shared()
+
+    def get_versions(self, recipe_id, author_id=None):
+        versions = {
+            version_key(Recipe, recipe_id): get_version(Recipe, recipe_id),
+            version_key(Tag): get_version(Tag),
+            version_key(Ingredient): get_version(Ingredient),
+        }
+        if author_id is not None:
+            versions[version_key(User, author_id)] = get_version(
+                User, author_id
+            )
+        return versions
+
+    @staticmethod
+    def convert_urls(data, convert):
+        """Применяет convert к ссылкам image и image_variants."""
+        if data.get('image'):
+            data['image'] = convert(data['image'])
+        if data.get('image_variants'):
+            data['image_variants'] = {
+                variant: {
+                    image_format: convert(url)
+                    for image_format, url in formats.items()
+                }
+                for variant, formats in data['image_variants'].items()
+            }
+
+    def get(self, recipe_id, request):
+        cached = cache.get(RECIPE_KEY.format(recipe_id))
+        if (
+            cached is None
+            or cache.get_many(cached['versions']) != cached['versions']
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        data = cached['data']
+        self.convert_urls(data, request.build_absolute_uri)
+        return data
+
+    def set(self, recipe_id, versions, data, request):
+        data = dict(data)
+        for field in self.user_fields:
+            data.pop(field, None)
+        data['author'] = dict(data['author'])
+        data['author'].pop('is_subscribed', None)
+        # Хост и схема первого запроса не должны попасть в ответы другим.
+        host = request.build_absolute_uri('/')[:-1]
+        self.convert_urls(data, lambda url: (
+            url[len(host):] if url.startswith(f'{host}/') else url
+        ))
+        cache.set(
+            RECIPE_KEY.format(recipe_id),
+            {'versions': versions, 'data': data},
+            timeout=REFERENCE_CACHE_MAX_AGE
+        )
+
+
+recipe_cache = RecipeCache()
+
+
+class TokenCache:
+    """Пользователь и токен по ключу токена: LRU с TTL в памяти воркера.
+
+    Запись хранит версию пользователя и перестаёт использоваться после
+    её смены (сохранение пользователя, удаление токена). Версия хранится
+    в общем кеше Django, поэтому смена сразу видна всем воркерам; с
+    локальным кешем процесса этого не гарантировать, и TokenCache не
+    используется. С AUTH_TOKEN_CACHE_SHARED записи также кладутся в кеш
+    Django и используются всеми воркерами.
+    """
+
+    def __init__(self, max_size=AUTH_TOKEN_CACHE_SIZE,
+                 ttl=AUTH_TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    @staticmethod
+    def enabled():
+        return cache_is_shared()
+
+    @staticmethod
+    def shared_key(key):
+        # Ключ токена не хранится в общем кеше в открытом виде.
+        return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is None and settings.AUTH_TOKEN_CACHE_SHARED:
+            entry = cache.get(self.shared_key(key))
+            if entry is not None:
+                self._store(key, entry)
+        return entry
+
+    def get(self, key):
+        entry = self._lookup(key)
+        if (
+            entry is None
+            or entry['expires'] < time.time()
+            or entry['version'] != get_version(User, entry['user'].pk)
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Копия, чтобы изменения request.user не попадали в кеш.
+        return copy.copy(entry['user']), entry['token']
+
+    def set(self, key, user, token):
+        entry = {
+            'user': copy.copy(user),
+            'token': token,
+            'version': get_version(User, user.pk),
+            'expires': time.time() + self.ttl,
+        }
+        self._store(key, entry)
+        if settings.AUTH_TOKEN_CACHE_SHARED:
+            cache.set(self.shared_key(key), entry, timeout=self.ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if settings.AUTH_TOKEN_CACHE_SHARED:
+            cache.delete(self.shared_key(key))
+
+
+token_cache = TokenCache()
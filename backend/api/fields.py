@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from recipes.images import variant_urls
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URL уменьшенных копий изображения в JPEG и WebP."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = variant_urls(value)
+        if request is None:
+            return urls
+        return {
+            variant: {
+                image_format: request.build_absolute_uri(url)
+                for image_format, url in formats.items()
+            }
+            for variant, formats in urls.items()
+        }
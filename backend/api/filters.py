@@ -1,12 +1,37 @@
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity
+)
+from django import forms
+from django.db import connections
+from django.db.models import Count, Exists, F, OuterRef, Q
 from django_filters.rest_framework import FilterSet, filters
 
+from foodgram.constants import SEARCH_CONFIG, TRIGRAM_SIMILARITY_THRESHOLD
 from recipes.models import Ingredient, Recipe
+from .tag_index import tag_index
+
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
+
+
+class MultipleValueField(forms.Field):
+    """Все значения повторяющегося параметра: ?tags=a&tags=b."""
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or [] if item]
+
+
+class MultipleValueFilter(filters.Filter):
+    field_class = MultipleValueField
 
 
 class RecipeFilter(FilterSet):
     author = filters.CharFilter()
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug', lookup_expr='contains'
+    tags = MultipleValueFilter(method='filter_tags')
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой тег'), (TAGS_MATCH_ALL, 'Все теги')),
+        method='filter_tags_match'
     )
     is_favorited = filters.BooleanFilter(
         field_name='is_favorited',
@@ -16,21 +41,78 @@ class RecipeFilter(FilterSet):
         field_name='is_in_shopping_cart',
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'author', 'tags', 'tags_match', 'is_favorited',
+            'is_in_shopping_cart', 'search'
+        ]
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым (или, при tags_match=all, со всеми) тегами.
+
+        Условие — подзапрос к промежуточной таблице, поэтому рецепт с
+        несколькими выбранными тегами не повторяется в выдаче. При
+        tags_match=all неизвестный тег не может быть у рецепта, поэтому
+        выдача пуста.
+        """
+        if not value:
+            return queryset
+        tag_ids = tag_index.get_ids(value)
+        if not tag_ids:
+            return queryset.none()
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL:
+            if len(tag_ids) < len(set(value)):
+                return queryset.none()
+            return queryset.filter(pk__in=recipe_tags.values(
+                'recipe_id'
+            ).annotate(
+                matched=Count('tag_id')
+            ).filter(matched=len(tag_ids)).values('recipe_id'))
+        return queryset.filter(
+            Exists(recipe_tags.filter(recipe_id=OuterRef('pk')))
+        )
+
+    def filter_tags_match(self, queryset, name, value):
+        # Учитывается в filter_tags.
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        found = queryset.filter(search_vector=query)
+        if found.exists():
+            return found.annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-published_at', '-id')
+        # Ничего не нашлось: вероятно, опечатка, ищем по триграммам.
+        return queryset.annotate(
+            similarity=TrigramSimilarity('name', value)
+        ).filter(
+            similarity__gte=TRIGRAM_SIMILARITY_THRESHOLD
+        ).order_by('-similarity', '-published_at', '-id')
+
 
 class IngredientFilter(FilterSet):
     name = filters.CharFilter(lookup_expr='istartswith')
@@ -0,0 +1,57 @@
+import bisect
+import threading
+
+from foodgram.versions import get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Строится при первом обращении и перестраивается при смене версии
+    модели Ingredient. Совпадения по началу названия идут раньше совпадений
+    по подстроке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = None
+        self._ingredients = None
+
+    def _load(self):
+        version = get_version(Ingredient)
+        with self._lock:
+            if self._version != version:
+                ingredients = sorted(
+                    Ingredient.objects.only(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator(),
+                    key=lambda ingredient: (
+                        ingredient.name.casefold(), ingredient.id
+                    )
+                )
+                self._ingredients = ingredients
+                self._keys = [
+                    ingredient.name.casefold() for ingredient in ingredients
+                ]
+                self._version = version
+            return self._keys, self._ingredients
+
+    def search(self, query, limit=None):
+        keys, ingredients = self._load()
+        query = query.casefold()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + '\U0010ffff', start)
+        result = ingredients[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for index, key in enumerate(keys):
+            if query in key and not key.startswith(query):
+                result.append(ingredients[index])
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
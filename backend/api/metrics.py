@@ -0,0 +1,333 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from glob import glob
+
+from django.conf import settings
+
+from foodgram.constants import (
+    METRICS_FLUSH_INTERVAL, METRICS_LATENCY_BUCKETS, METRICS_QUERY_BUCKETS
+)
+from foodgram.db.pool import pool_stats
+from .cache import payload_cache, recipe_cache, token_cache
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+CACHES = {
+    'payload': payload_cache, 'recipe': recipe_cache, 'token': token_cache
+}
+HELP = {
+    'foodgram_http_requests_total': (
+        'counter', 'Число обработанных запросов.'
+    ),
+    'foodgram_http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.'
+    ),
+    'foodgram_db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на один запрос.'
+    ),
+    'foodgram_image_processing_seconds': (
+        'histogram', 'Время создания вариантов изображения за запрос.'
+    ),
+    'foodgram_cache_requests_total': (
+        'counter', 'Обращения к кешам воркеров.'
+    ),
+    'foodgram_cache_hit_ratio': (
+        'gauge', 'Доля попаданий в кеш по всем воркерам.'
+    ),
+    'foodgram_db_pool_connections': (
+        'gauge', 'Соединения пула: открытые, занятые, свободные, предел.'
+    ),
+    'foodgram_db_pool_utilization': (
+        'gauge', 'Доля занятых соединений пула от предела.'
+    ),
+    'foodgram_db_pool_requests_total': (
+        'counter', 'Запросы соединения из пула.'
+    ),
+    'foodgram_db_pool_waits_total': (
+        'counter', 'Запросы, ждавшие свободного соединения.'
+    ),
+    'foodgram_db_pool_wait_seconds_total': (
+        'counter', 'Суммарное ожидание свободного соединения.'
+    ),
+    'foodgram_db_pool_timeouts_total': (
+        'counter', 'Запросы, не дождавшиеся соединения.'
+    ),
+}
+POOL_GAUGES = ('open', 'in_use', 'idle', 'max_size')
+POOL_COUNTERS = ('requests', 'waits', 'wait_seconds', 'timeouts')
+ARCHIVE_NAME = 'archive.json'
+EMPTY_SNAPSHOT = {'counters': [], 'histograms': [], 'gauges': []}
+
+
+class MetricsRegistry:
+    """Счётчики и гистограммы воркера в формате Prometheus.
+
+    При заданном METRICS_DIR каждый воркер раз в METRICS_FLUSH_INTERVAL
+    секунд записывает свои значения в отдельный файл, а при выдаче
+    метрик файлы всех воркеров суммируются. Счётчики завершившихся
+    воркеров переносятся в archive.json, их gauge-значения отбрасываются.
+    METRICS_DIR должна быть своей для каждого контейнера: живость воркера
+    проверяется по pid.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * len(buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record_request(self, route, method, status, duration, timings):
+        labels = {'route': route or 'unresolved', 'method': method}
+        self.inc(
+            'foodgram_http_requests_total', {**labels, 'status': status}
+        )
+        self.observe(
+            'foodgram_http_request_duration_seconds', labels, duration,
+            METRICS_LATENCY_BUCKETS
+        )
+        self.observe(
+            'foodgram_db_queries_per_request', labels, timings.db_queries,
+            METRICS_QUERY_BUCKETS
+        )
+        if 'image' in timings.spans:
+            self.observe(
+                'foodgram_image_processing_seconds', labels,
+                timings.spans['image'], METRICS_LATENCY_BUCKETS
+            )
+        self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                [name, labels, value]
+                for (name, labels), value in self.counters.items()
+            ]
+            histograms = [
+                [name, labels, dict(histogram, counts=list(
+                    histogram['counts']
+                ))]
+                for (name, labels), histogram in self.histograms.items()
+            ]
+        for cache_name, cache in CACHES.items():
+            for result, value in cache.stats().items():
+                counters.append([
+                    'foodgram_cache_requests_total',
+                    (('cache', cache_name), ('result', result)), value
+                ])
+        gauges = []
+        for alias, stats in pool_stats().items():
+            for state in POOL_GAUGES:
+                gauges.append([
+                    'foodgram_db_pool_connections',
+                    (('alias', alias), ('state', state)), stats[state]
+                ])
+            for counter in POOL_COUNTERS:
+                counters.append([
+                    f'foodgram_db_pool_{counter}_total', (('alias', alias),),
+                    stats[counter]
+                ])
+        return {
+            'pid': os.getpid(), 'counters': counters,
+            'histograms': histograms, 'gauges': gauges,
+        }
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+            not force and now - self.flushed < METRICS_FLUSH_INTERVAL
+        ):
+            return
+        self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        write_snapshot(
+            os.path.join(directory, f'{os.getpid()}.json'), self.snapshot()
+        )
+
+    def collect(self):
+        """Значения всех воркеров, сложенные по имени и меткам.
+
+        Gauge-значения берутся только у живых воркеров.
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            return merge_snapshots([self.snapshot()])
+        self.flush(force=True)
+        archive = os.path.join(directory, ARCHIVE_NAME)
+        with open(os.path.join(directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots, dead = [], []
+            for path in glob(os.path.join(directory, '*.json')):
+                snapshot = read_snapshot(path)
+                if snapshot is None:
+                    continue
+                pid = snapshot.get('pid')
+                if pid is not None and not process_alive(pid):
+                    snapshot['gauges'] = []
+                    dead.append((path, snapshot))
+                snapshots.append(snapshot)
+            if dead:
+                counters, histograms, _ = merge_snapshots(
+                    [read_snapshot(archive) or EMPTY_SNAPSHOT]
+                    + [snapshot for _, snapshot in dead]
+                )
+                write_snapshot(archive, {
+                    'pid': None,
+                    'counters': [
+                        [name, labels, value]
+                        for (name, labels), value in counters.items()
+                    ],
+                    'histograms': [
+                        [name, labels, histogram]
+                        for (name, labels), histogram in histograms.items()
+                    ],
+                    'gauges': [],
+                })
+                for path, _ in dead:
+                    os.remove(path)
+        return merge_snapshots(snapshots)
+
+    def render(self):
+        counters, histograms, gauges = self.collect()
+        lines = {name: [] for name in HELP}
+        for (name, labels), value in sorted(
+            {**counters, **gauges}.items()
+        ):
+            lines[name].append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(
+                histogram['buckets'], histogram['counts']
+            ):
+                cumulative += count
+                lines[name].append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels + (("le", bound),))} '
+                    f'{cumulative}'
+                )
+            lines[name].extend((
+                f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} '
+                f'{histogram["count"]}',
+                f'{name}_sum{format_labels(labels)} {histogram["sum"]}',
+                f'{name}_count{format_labels(labels)} {histogram["count"]}',
+            ))
+        for cache_name in CACHES:
+            hits = counters.get((
+                'foodgram_cache_requests_total',
+                (('cache', cache_name), ('result', 'hits'))
+            ), 0)
+            misses = counters.get((
+                'foodgram_cache_requests_total',
+                (('cache', cache_name), ('result', 'misses'))
+            ), 0)
+            if hits + misses:
+                lines['foodgram_cache_hit_ratio'].append(
+                    f'foodgram_cache_hit_ratio'
+                    f'{format_labels((("cache", cache_name),))} '
+                    f'{hits / (hits + misses):.4f}'
+                )
+        for (name, labels), value in gauges.items():
+            if labels[1] != ('state', 'max_size') or not value:
+                continue
+            in_use = gauges.get((name, (labels[0], ('state', 'in_use'))), 0)
+            lines['foodgram_db_pool_utilization'].append(
+                f'foodgram_db_pool_utilization{format_labels(labels[:1])} '
+                f'{in_use / value:.4f}'
+            )
+        output = []
+        for name, (metric_type, description) in HELP.items():
+            if lines[name]:
+                output.append(f'# HELP {name} {description}')
+                output.append(f'# TYPE {name} {metric_type}')
+                output.extend(lines[name])
+        return '\n'.join(output) + '\n'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp'
+    )
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+def merge_snapshots(snapshots):
+    """Складывает счётчики, гистограммы и gauge-значения снимков."""
+    counters, histograms, gauges = {}, {}, {}
+    for snapshot in snapshots:
+        for target, values in (
+            (counters, snapshot['counters']),
+            (gauges, snapshot.get('gauges', ())),
+        ):
+            for name, labels, value in values:
+                key = (name, tuple(map(tuple, labels)))
+                target[key] = target.get(key, 0) + value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, {
+                'buckets': histogram['buckets'],
+                'counts': [0] * len(histogram['buckets']),
+                'sum': 0.0,
+                'count': 0,
+            })
+            for index, count in enumerate(histogram['counts']):
+                total['counts'][index] += count
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return counters, histograms, gauges
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{key}="{value}"' for key, value in labels
+    ) + '}'
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,99 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from foodgram import timing
+from .metrics import metrics
+
+logger = logging.getLogger('api.timing')
+
+
+class RequestTimingMiddleware:
+    """Время SQL, view и рендеринга каждого запроса.
+
+    С REQUEST_TIMING значения попадают в заголовок Server-Timing и в лог,
+    с METRICS — в реестр метрик. Если обе настройки выключены, Django
+    исключает middleware из цепочки при запуске.
+    """
+
+    def __init__(self, get_response):
+        self.server_timing = settings.REQUEST_TIMING
+        self.metrics = settings.METRICS
+        if not (self.server_timing or self.metrics):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = timing.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.finish(token)
+        total = timings.total()
+        route = self.route_name(request)
+        if self.metrics:
+            metrics.record_request(
+                route, request.method, response.status_code, total, timings
+            )
+        if self.server_timing:
+            self.report(request, response, route, timings, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing.current().view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = timing.current()
+        view_finished = time.perf_counter()
+        timings.add('view', view_finished - timings.view_started)
+        response.add_post_render_callback(
+            lambda response: timings.add(
+                'render', time.perf_counter() - view_finished
+            )
+        )
+        return response
+
+    def report(self, request, response, route, timings, total):
+        entries = self.entries(timings, total)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in entries
+        )
+        logger.info(json.dumps({
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'db_queries': timings.db_queries,
+            **{
+                f'{name}_ms': round(duration * 1000, 1)
+                for name, duration, _ in entries
+            },
+        }))
+
+    def entries(self, timings, total):
+        """(имя, длительность, описание) для Server-Timing и лога."""
+        spans = dict(timings.spans)
+        if 'view' not in spans and timings.view_started is not None:
+            # Обычный HttpResponse: рендеринг входит во время view.
+            spans['view'] = total - (timings.view_started - timings.started)
+        return [
+            ('db', timings.db_time, f'{timings.db_queries} queries'),
+            *((name, duration, None) for name, duration in spans.items()),
+            ('total', total, None),
+        ]
+
+    @staticmethod
+    def route_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.url_name or match.view_name
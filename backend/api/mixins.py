@@ -0,0 +1,47 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from foodgram.constants import REFERENCE_CACHE_MAX_AGE
+from foodgram.versions import get_version
+from .cache import payload_cache
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified и кеш ответа для редко меняющихся справочников.
+
+    Ответ привязан к версии модели queryset: при совпадении версии
+    отдаётся 304 или сохранённые данные без запросов к базе.
+    """
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        model = self.queryset.model
+        version = get_version(model)
+        etag = quote_etag(f'{model._meta.model_name}-{version}')
+        last_modified = version // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = (model._meta.label_lower, request.get_full_path())
+            data = payload_cache.get(key, version)
+            if data is None:
+                data = handler(request, *args, **kwargs).data
+                payload_cache.set(key, version, data)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=REFERENCE_CACHE_MAX_AGE
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
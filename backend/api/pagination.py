@@ -1,5 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.constants import MAX_PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (курсору) без COUNT(*) и OFFSET.
+
+    Порядок задаётся атрибутом cursor_ordering у view: уникальная пара
+    полей, например ('-published_at', '-id').
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    default_ordering = ('-published_at', '-id')
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = getattr(
+            view, 'cursor_ordering', self.default_ordering
+        )
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        reverse, position = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(name) for name in ordering]
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self.get_position(results[-1])
+        if results and (has_more or not reverse) and position is not None:
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_link(self.next_position, reverse=False)),
+            ('previous', self.get_link(self.previous_position, reverse=True)),
+            ('results', data),
+        ]))
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def after(self, ordering, position):
+        """Условие «строго после position» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_position(self, obj):
+        return [field.value_to_string(obj) for field in self.fields]
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        cursor = base64.urlsafe_b64encode(
+            json.dumps([int(reverse)] + position).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+        try:
+            reverse, *position = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+            if len(position) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (TypeError, ValueError, binascii.Error,
+                UnicodeDecodeError) as error:
+            raise NotFound(self.invalid_cursor_message) from error
+        return bool(reverse), position
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация с опциональным режимом курсора.
+
+    Передача параметра cursor (в том числе пустого для первой страницы)
+    переключает запрос на KeysetPagination, если у view задан
+    cursor_ordering; у остальных view параметр игнорируется.
+    """
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (KeysetPagination.cursor_query_param in request.query_params
+                and hasattr(view, 'cursor_ordering')):
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
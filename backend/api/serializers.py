@@ -1,12 +1,17 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from recipes.images import build_variants
 from recipes.models import (
     Favorite, Ingredient, IngredientRecipe, Recipe,
     ShoppingCart, Subscription, Tag
 )
+from foodgram.constants import BULK_MAX_IDS
 from users.models import User
+from .fields import ImageVariantsField
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -24,6 +29,8 @@ class CustomUserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
@@ -60,9 +67,7 @@ class IngredientRecipeReadSerializer(serializers.ModelSerializer):
 
 
 class IngredientRecipeWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientRecipe
@@ -78,15 +83,19 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'name', 'text',
-            'cooking_time', 'image', 'is_favorited', 'is_in_shopping_cart'
+            'cooking_time', 'image', 'image_variants', 'is_favorited',
+            'is_in_shopping_cart'
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context['request']
         return bool(request
                     and request.user.is_authenticated
@@ -95,6 +104,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
                     ).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context['request']
         return bool(request
                     and request.user.is_authenticated
@@ -109,9 +120,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeWriteSerializer(
         many=True, source='ingredients_recipe'
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Recipe
@@ -121,13 +130,62 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
+        # UpdateModelMixin сбрасывает кеш prefetch после сохранения.
+        if not getattr(instance, '_prefetched_objects_cache', None):
+            prefetch_related_objects(
+                [instance], 'tags', Prefetch(
+                    'ingredients_recipe',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
         return RecipeGetSerializer(
             instance,
             context={'request': self.context.get('request')}
         ).data
 
     def validate(self, data):
-        ingredients_data = data.get('ingredients_recipe')
+        if not self.partial or 'ingredients_recipe' in data:
+            self.validate_ingredients_data(data.get('ingredients_recipe'))
+        if not self.partial or 'tags' in data:
+            self.validate_tags_data(data.get('tags'))
+        self.resolve_related(data)
+        return data
+
+    def resolve_related(self, data):
+        """Заменяет id ингредиентов и тегов объектами: по одному запросу
+        на модель, все несуществующие id попадают в одну ошибку."""
+        errors = {}
+        ingredients_data = data.get('ingredients_recipe') or []
+        ingredients = Ingredient.objects.in_bulk(
+            [ingredient['id'] for ingredient in ingredients_data]
+        )
+        missing = [
+            ingredient['id'] for ingredient in ingredients_data
+            if ingredient['id'] not in ingredients
+        ]
+        if missing:
+            errors['ingredients'] = (
+                'Несуществующие ингредиенты: '
+                f'{", ".join(map(str, missing))}.'
+            )
+        tags = Tag.objects.in_bulk(data.get('tags') or [])
+        missing = [
+            tag_id for tag_id in data.get('tags') or [] if tag_id not in tags
+        ]
+        if missing:
+            errors['tags'] = (
+                f'Несуществующие теги: {", ".join(map(str, missing))}.'
+            )
+        if errors:
+            raise ValidationError(errors)
+        for ingredient in ingredients_data:
+            ingredient['id'] = ingredients[ingredient['id']]
+        if 'tags' in data:
+            data['tags'] = [tags[tag_id] for tag_id in data['tags']]
+
+    def validate_ingredients_data(self, ingredients_data):
         if not ingredients_data:
             raise ValidationError('Список ингридиентов не может быть пустым.')
         check_unique_id = []
@@ -136,12 +194,12 @@ class RecipeSerializer(serializers.ModelSerializer):
             check_unique_id.append(ingredient_id)
         if len(check_unique_id) != len(set(check_unique_id)):
             raise ValidationError('Ингридиенты должны быть уникальными.')
-        tags_data = data.get('tags')
+
+    def validate_tags_data(self, tags_data):
         if not tags_data:
             raise ValidationError('Список тегов не может быть пустым.')
         if len(tags_data) != len(set(tags_data)):
             raise ValidationError('Теги должны быть уникальными.')
-        return data
 
     def validate_image(self, value):
         if not value:
@@ -156,8 +214,44 @@ class RecipeSerializer(serializers.ModelSerializer):
                 amount=ingredient['amount']
             ) for ingredient in ingredients_data
         ]
-        IngredientRecipe.objects.bulk_create(ingredients_data_list)
+        if ingredients_data_list:
+            IngredientRecipe.objects.bulk_create(ingredients_data_list)
+
+    def update_ingredients(self, ingredients_data, recipe):
+        """Применяет только разницу между текущими и новыми ингредиентами."""
+        existing = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in recipe.ingredients_recipe.all()
+        }
+        submitted = {
+            ingredient['id'].id: ingredient for ingredient in ingredients_data
+        }
+        removed = [
+            existing[ingredient_id].id
+            for ingredient_id in existing.keys() - submitted.keys()
+        ]
+        if removed:
+            IngredientRecipe.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, ingredient in submitted.items():
+            ingredient_recipe = existing.get(ingredient_id)
+            if (
+                ingredient_recipe is not None
+                and ingredient_recipe.amount != ingredient['amount']
+            ):
+                ingredient_recipe.amount = ingredient['amount']
+                changed.append(ingredient_recipe)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [
+                ingredient for ingredient_id, ingredient in submitted.items()
+                if ingredient_id not in existing
+            ],
+            recipe
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients_recipe')
         tags_data = validated_data.pop('tags')
@@ -165,32 +259,27 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(ingredients_data, recipe)
+        build_variants(recipe.image)
+        # Новый рецепт ещё не в избранном и не в корзине, а на себя
+        # автор не подписан: флаги известны без запросов.
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        recipe.author.is_subscribed = False
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags_data = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags_data)
-
-        ingredients_data = validated_data.pop('ingredients_recipe')
-        ingredients_recipe = instance.ingredients_recipe.all()
-        ingredients_recipe.delete()
-
-        self.create_ingredients(ingredients_data, instance)
+        tags_data = validated_data.pop('tags', None)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
 
-        return super().update(instance, validated_data)
+        ingredients_data = validated_data.pop('ingredients_recipe', None)
+        if ingredients_data is not None:
+            self.update_ingredients(ingredients_data, instance)
 
-        # validated_data.pop('ingredients_recipe')
-        # ingredients_data = validated_data.pop('ingredients_recipe')
-        # tags_data = validated_data.pop('tags')
-        # instance.tags.clear()
-        # IngredientRecipe.objects.filter(recipe=instance).delete()
-        # super().update(instance, validated_data)
-
-        # self.create_ingredients(ingredients_data, instance)
-        # instance.tags.set(tags_data)
-
-        # return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            build_variants(instance.image)
+        return instance
 
 
 class SubscirptionCreateSerializer(serializers.ModelSerializer):
@@ -218,15 +307,16 @@ class SubscirptionCreateSerializer(serializers.ModelSerializer):
 
 
 class DisplayRecipesSubscriptionSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class SubscirptionRespondSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(CustomUserSerializer.Meta):
         model = User
@@ -235,6 +325,8 @@ class SubscirptionRespondSerializer(CustomUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context['request']
         return bool(request
                     and request.user.is_authenticated
@@ -243,13 +335,15 @@ class SubscirptionRespondSerializer(CustomUserSerializer):
                         subscriber=request.user
                     ).exists())
 
-    def get_recipes_count(self, user):
-        return Recipe.objects.filter(
-            author=user).count()
-
     def get_recipes(self, user):
+        if hasattr(user, 'limited_recipes'):
+            return DisplayRecipesSubscriptionSerializer(
+                user.limited_recipes, many=True, context=self.context
+            ).data
         request = self.context.get('request')
-        recipes = Recipe.objects.filter(author=user)
+        recipes = Recipe.objects.filter(author=user).order_by(
+            '-published_at', '-id'
+        )
         recipes_limit = request.query_params.get('recipes_limit')
         if recipes_limit:
             try:
@@ -262,46 +356,20 @@ class SubscirptionRespondSerializer(CustomUserSerializer):
         ).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError('Рецепт уже в избранном.')
-        return data
-
-    def to_representation(self, instance):
-        return FavoriteDisplaySerializer(
-            instance=instance.recipe,
-        ).data
-
-
 class FavoriteDisplaySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
-
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
 
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError('Рецепт уже в корзине.')
-        return data
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS
+    )
 
-    def to_representation(self, instance):
-        return FavoriteDisplaySerializer(
-            instance=instance.recipe,
-        ).data
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
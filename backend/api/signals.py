@@ -0,0 +1,72 @@
+from django.core.signals import request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from foodgram.db import close_unusable_connections
+from foodgram.versions import bump_version
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+from .cache import token_cache
+
+
+def bump_recipe_version(sender, instance, **kwargs):
+    bump_version(Recipe, pk=instance.pk)
+
+
+def bump_ingredient_recipe_version(sender, instance, **kwargs):
+    bump_version(Recipe, pk=instance.recipe_id)
+
+
+def bump_recipe_tags_version(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version(Recipe, pk=instance.pk)
+        return
+    for recipe_id in pk_set or ():
+        bump_version(Recipe, pk=recipe_id)
+
+
+def bump_user_version(sender, instance, **kwargs):
+    bump_version(User, pk=instance.pk)
+
+
+def drop_cached_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+    # Записи в памяти других воркеров сбрасываются через версию.
+    bump_version(User, pk=instance.user_id)
+
+
+def connect_signals():
+    for model in (Ingredient, Tag):
+        post_save.connect(
+            bump_version, sender=model,
+            dispatch_uid=f'{model._meta.label_lower}_version_save'
+        )
+        post_delete.connect(
+            bump_version, sender=model,
+            dispatch_uid=f'{model._meta.label_lower}_version_delete'
+        )
+    for action, signal in (('save', post_save), ('delete', post_delete)):
+        signal.connect(
+            bump_recipe_version, sender=Recipe,
+            dispatch_uid=f'recipe_version_{action}'
+        )
+        signal.connect(
+            bump_ingredient_recipe_version, sender=IngredientRecipe,
+            dispatch_uid=f'ingredient_recipe_version_{action}'
+        )
+    m2m_changed.connect(
+        bump_recipe_tags_version, sender=Recipe.tags.through,
+        dispatch_uid='recipe_tags_version'
+    )
+    post_save.connect(
+        bump_user_version, sender=User, dispatch_uid='user_version'
+    )
+    post_delete.connect(
+        drop_cached_token, sender=Token, dispatch_uid='auth_token_delete'
+    )
+    request_started.connect(
+        close_unusable_connections, dispatch_uid='db_health_checks'
+    )
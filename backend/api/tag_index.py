@@ -0,0 +1,33 @@
+import threading
+
+from foodgram.versions import get_version
+from recipes.models import Tag
+
+
+class TagIndex:
+    """Соответствие slug → id тегов в памяти процесса.
+
+    Перестраивается при смене версии модели Tag, поэтому фильтр по тегам
+    не обращается к таблице тегов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = None
+
+    def _load(self):
+        version = get_version(Tag)
+        with self._lock:
+            if self._version != version:
+                self._ids = dict(Tag.objects.values_list('slug', 'id'))
+                self._version = version
+            return self._ids
+
+    def get_ids(self, slugs):
+        """id известных тегов без повторов; неизвестные slug пропускаются."""
+        ids = self._load()
+        return list(dict.fromkeys(ids[slug] for slug in slugs if slug in ids))
+
+
+tag_index = TagIndex()
@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (
     CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet,
     SubscriptionListView, SubscriptionView,
     ShoppingCartView, ShoppingCartListView,
-    FavoriteView
+    ShoppingCartBulkView, ShoppingCartClearView,
+    FavoriteView, FavoriteBulkView, MetricsView
 )
 app_name = 'api'
 
@@ -17,17 +20,41 @@ router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('tags', TagViewSet, basename='tags')
 
+if settings.ASYNC_VIEWS:
+    favorite_view = async_views.favorite
+    shopping_cart_view = async_views.shopping_cart
+    subscription_view = async_views.subscription
+else:
+    favorite_view = FavoriteView.as_view()
+    shopping_cart_view = ShoppingCartView.as_view()
+    subscription_view = SubscriptionView.as_view()
+
 urlpatterns = [
     path(
         'recipes/<int:recipe_pk>/shopping_cart/',
-        ShoppingCartView.as_view(),
+        shopping_cart_view,
         name='shopping_cart'
     ),
     path(
         'recipes/<int:recipe_pk>/favorite/',
-        FavoriteView.as_view(),
+        favorite_view,
         name='favorite-list'
     ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBulkView.as_view(),
+        name='shopping_cart-bulk'
+    ),
+    path(
+        'recipes/shopping_cart/clear/',
+        ShoppingCartClearView.as_view(),
+        name='shopping_cart-clear'
+    ),
+    path(
+        'recipes/favorite/',
+        FavoriteBulkView.as_view(),
+        name='favorite-bulk'
+    ),
     path(
         'recipes/download_shopping_cart/',
         ShoppingCartListView.as_view(),
@@ -40,9 +67,10 @@ urlpatterns = [
     ),
     path(
         'users/<int:user_id>/subscribe/',
-        SubscriptionView.as_view(),
+        subscription_view,
         name='subscription'
     ),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router_v1.urls)),
@@ -1,19 +1,32 @@
+import csv
+import hashlib
+import io
+import json
+from itertools import chain
+
 from rest_framework import (
     viewsets, status, permissions,
 )
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Exists, F, OuterRef, Prefetch, Sum, Value, Window
+)
+from django.db.models.functions import RowNumber
+from django.http import Http404, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from djoser.views import UserViewSet
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import (
-    AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+    AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
+from recipes.counters import change_counters
 from recipes.models import (
     Favorite, Ingredient, IngredientRecipe,
     Recipe, ShoppingCart, Subscription, Tag
@@ -21,11 +34,15 @@ from recipes.models import (
 from api.pagination import CustomPagination
 from users.models import User
 from .filters import IngredientFilter, RecipeFilter
+from .cache import recipe_cache
+from .ingredient_index import ingredient_index
+from .metrics import CONTENT_TYPE, metrics
+from .mixins import ConditionalGetMixin
 from .permissions import IsRecipeAuthorOrReadOnly
 from .serializers import (
-    CustomUserSerializer, FavoriteSerializer,
+    CustomUserSerializer, FavoriteDisplaySerializer,
     IngredientSerializer, RecipeGetSerializer, RecipeSerializer,
-    ShoppingCartSerializer, SubscirptionCreateSerializer,
+    RecipeIdsSerializer, SubscirptionCreateSerializer,
     SubscirptionRespondSerializer, TagSerializer,
 )
 
@@ -34,20 +51,45 @@ class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = super().get_queryset()
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(
+                subscriber=user, subscribed_to=OuterRef('pk')
+            )
+        ))
+
     def get_permissions(self):
         if self.action == 'me':
             return [IsAuthenticated()]
         return super().get_permissions()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    authentication_classes = ()
     permission_classes = (AllowAny,)
     pagination_class = None
     serializer_class = IngredientSerializer
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = max(int(request.query_params['limit']), 0)
+        except (KeyError, ValueError, TypeError):
+            limit = None
+        serializer = self.get_serializer(
+            ingredient_index.search(name, limit), many=True
+        )
+        return Response(serializer.data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all().order_by('-published_at')
@@ -55,6 +97,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     permission_classes = (IsAuthenticatedOrReadOnly, IsRecipeAuthorOrReadOnly)
     pagination_class = CustomPagination
+    cursor_ordering = ('-published_at', '-id')
+
+    def get_queryset(self):
+        if self.action == 'destroy':
+            return super().get_queryset()
+        user = self.request.user
+        authors = User.objects.all()
+        queryset = super().get_queryset().prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_recipe',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+        if user.is_authenticated:
+            authors = authors.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(
+                    subscriber=user, subscribed_to=OuterRef('pk')
+                )
+            ))
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        else:
+            authors = authors.annotate(is_subscribed=Value(False))
+            queryset = queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return queryset.prefetch_related(Prefetch('author', queryset=authors))
+
+    def get_user_flags(self, recipe_id):
+        user = self.request.user
+        if not user.is_authenticated:
+            return {
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+                'is_subscribed': False,
+            }
+        return Recipe.objects.filter(pk=recipe_id).values(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Subscription.objects.filter(
+                subscriber=user, subscribed_to=OuterRef('author')
+            )),
+        ).first()
+
+    def retrieve(self, request, *args, **kwargs):
+        if not recipe_cache.enabled():
+            return super().retrieve(request, *args, **kwargs)
+        recipe_id = self.kwargs[self.lookup_field]
+        data = recipe_cache.get(recipe_id, request)
+        if data is None:
+            versions = recipe_cache.get_versions(recipe_id)
+            instance = self.get_object()
+            versions = {
+                **recipe_cache.get_versions(instance.pk, instance.author_id),
+                **versions,
+            }
+            data = self.get_serializer(instance).data
+            recipe_cache.set(instance.pk, versions, data, request)
+            return Response(data)
+        flags = self.get_user_flags(recipe_id)
+        if flags is None:
+            raise Http404
+        data['author']['is_subscribed'] = flags.pop('is_subscribed')
+        data.update(flags)
+        return Response(data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Счётчик избранного удаляемого рецепта не нужен, поэтому связи
+        # удаляются одним запросом без post_delete на каждую строку.
+        table = connection.ops.quote_name(Favorite._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE recipe_id = %s', [instance.pk]
+            )
+        instance.delete()
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -62,9 +192,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeSerializer
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    authentication_classes = ()
     permission_classes = (AllowAny, )
     pagination_class = None
 
@@ -72,44 +203,144 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
 class ShoppingCartListView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
     filterset_class = RecipeFilter
-
-    def make_file(self, ingredients):
-        ingredients_info = []
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            amount = ingredient['ingredient__measurement_unit']
-            measurement_unit = ingredient['total_qty']
-            ingredients_info.append(f'{name}: {amount} {measurement_unit}')
-        content = '\n'.join(ingredients_info)
-        response = FileResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+    content_types = {
+        'txt': 'text/plain; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+        'json': 'application/json; charset=utf-8',
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
+
+    def render_txt(self, ingredients):
+        for name, measurement_unit, total_qty in ingredients:
+            yield f'{name}: {total_qty} {measurement_unit}\n'
+
+    def render_csv(self, ingredients):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        rows = chain(
+            [('Ингредиент', 'Количество', 'Единица измерения')],
+            (
+                (name, total_qty, measurement_unit)
+                for name, measurement_unit, total_qty in ingredients
+            )
         )
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def render_json(self, ingredients):
+        yield '['
+        for index, (name, measurement_unit, total_qty) in enumerate(
+            ingredients
+        ):
+            yield ',' * bool(index) + json.dumps({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': total_qty,
+            }, ensure_ascii=False)
+        yield ']'
+
+    def make_file(self, ingredients, file_format):
+        etag = quote_etag(hashlib.md5(
+            repr((file_format, ingredients)).encode()
+        ).hexdigest())
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            content = ''.join(
+                getattr(self, f'render_{file_format}')(ingredients)
+            ).encode()
+            response = HttpResponse(
+                content, content_type=self.content_types[file_format]
+            )
+            response['Content-Length'] = len(content)
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_cart.{file_format}"'
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
     def get(self, request, *args, **kwargs):
-        ingredients = IngredientRecipe.objects.filter(
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in self.content_types:
+            return Response({
+                'error': 'Доступные форматы: '
+                f'{", ".join(self.content_types)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ingredients = list(IngredientRecipe.objects.filter(
             recipe__shopping_cart__user=request.user
         ).values(
             'ingredient__name', 'ingredient__measurement_unit'
         ).annotate(
             total_qty=Sum('amount')
-        )
+        ).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_qty'
+        ))
 
-        return self.make_file(ingredients)
+        return self.make_file(ingredients, file_format)
 
 
 class SubscriptionListView(ListAPIView):
     serializer_class = SubscirptionRespondSerializer
     pagination_class = CustomPagination
+    cursor_ordering = ('username', 'id')
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
     def get_queryset(self):
         current_user = self.request.user
-        queryset = User.objects.filter(subscribed_to__subscriber=current_user)
+        queryset = User.objects.filter(
+            subscribed_to__subscriber=current_user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).order_by('username')
 
         return queryset
 
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError, TypeError):
+            return None
+        return max(recipes_limit, 0)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.attach_recipes(page, self.get_recipes_limit())
+        return page
+
+    def attach_recipes(self, authors, recipes_limit):
+        """Загружает первые recipes_limit рецептов всех авторов страницы
+        одним запросом с ROW_NUMBER() по автору."""
+        recipes = Recipe.objects.filter(author__in=authors).only(
+            'id', 'name', 'image', 'cooking_time', 'author_id', 'published_at'
+        ).order_by('-published_at', '-id')
+        if recipes_limit is not None:
+            sql, params = recipes.annotate(row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('published_at').desc(), F('id').desc()],
+            )).query.sql_with_params()
+            recipes = Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) AS windowed '
+                'WHERE windowed.row_number <= %s '
+                'ORDER BY windowed.published_at DESC, windowed.id DESC',
+                (*params, recipes_limit)
+            )
+        recipes_by_author = {author.id: [] for author in authors}
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.limited_recipes = recipes_by_author[author.id]
+
 
 class SubscriptionView(ListAPIView):
     permission_classes = (IsAuthenticatedOrReadOnly,)
@@ -117,7 +348,6 @@ class SubscriptionView(ListAPIView):
 
     def post(self, request, user_id):
         subscribed_to = get_object_or_404(User, pk=user_id)
-        subscribed_to.save()
         subscriber = request.user
 
         serializer_create = SubscirptionCreateSerializer(
@@ -149,69 +379,176 @@ class SubscriptionView(ListAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class FavoriteView(ListAPIView):
+class UserRecipeRelationView(APIView):
+    """Добавление рецепта в избранное или корзину и удаление из них.
+
+    Повторы отсекает уникальное ограничение (user, recipe), поэтому
+    одновременные запросы дают один 201 и 400 для остальных.
+    """
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    model = None
+    exists_message = None
+    missing_message = None
 
     def post(self, request, recipe_pk):
-        user_id = request.user.id
-        serializer_create = FavoriteSerializer(
-            data={
-                'user': user_id,
-                'recipe': recipe_pk,
-            }
-        )
-        serializer_create.is_valid(raise_exception=True)
-        serializer_create.save()
+        try:
+            with transaction.atomic():
+                relation = self.model.objects.create(
+                    user=request.user, recipe_id=recipe_pk
+                )
+        except IntegrityError:
+            if not Recipe.objects.filter(pk=recipe_pk).exists():
+                return Response({
+                    'error': 'Рецепт не найден.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({
+                'error': self.exists_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
-            serializer_create.data, status=status.HTTP_201_CREATED
+            FavoriteDisplaySerializer(
+                relation.recipe, context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
         )
 
     def delete(self, request, recipe_pk):
-        get_object_or_404(Recipe, pk=recipe_pk)
-        user_id = request.user.id
-        favorites = Favorite.objects.filter(
-            user=user_id,
+        deleted, _ = self.model.objects.filter(
+            user=request.user,
             recipe=recipe_pk
+        ).delete()
+        if deleted:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, pk=recipe_pk)
+        return Response({
+            'error': self.missing_message},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-        if not favorites.exists():
-            return Response({
-                'error': 'рецепта нет в избранном'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        favorites.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
 
+class FavoriteView(UserRecipeRelationView):
+    model = Favorite
+    exists_message = 'Рецепт уже в избранном.'
+    missing_message = 'рецепта нет в избранном'
+
+
+class ShoppingCartView(UserRecipeRelationView):
+    model = ShoppingCart
+    exists_message = 'Рецепт уже в корзине.'
+    missing_message = 'рецепта нет в корзине'
+
+
+class BulkUserRecipeRelationView(APIView):
+    """Добавление и удаление списка рецептов одним запросом.
+
+    Возвращает статус по каждому id: added/exists/not_found при
+    добавлении и removed/missing при удалении.
+    """
+    permission_classes = (IsAuthenticated,)
+    model = None
+
+    def get_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def execute(self, sql, params):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=table), params)
+            return {row[0] for row in cursor.fetchall()}
+
+    def insert_relations(self, user, recipe_ids):
+        """Добавляет связи одним INSERT и возвращает id рецептов, для
+        которых строка действительно вставлена: строки, добавленные
+        одновременным запросом, RETURNING не возвращает."""
+        if not recipe_ids:
+            return set()
+        values = ', '.join(['(%s, %s)'] * len(recipe_ids))
+        return self.execute(
+            f'INSERT INTO {{table}} (user_id, recipe_id) VALUES {values} '
+            'ON CONFLICT DO NOTHING RETURNING recipe_id',
+            [value for recipe_id in recipe_ids for value in (
+                user.pk, recipe_id
+            )]
+        )
 
-class ShoppingCartView(ListAPIView):
-    permission_classes = (IsAuthenticatedOrReadOnly,)
+    def delete_relations(self, user, recipe_ids):
+        """Удаляет связи одним DELETE и возвращает id удалённых."""
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        return self.execute(
+            'DELETE FROM {table} WHERE user_id = %s '
+            f'AND recipe_id IN ({placeholders}) RETURNING recipe_id',
+            [user.pk, *recipe_ids]
+        )
 
-    def post(self, request, recipe_pk):
-        user_id = request.user.id
-        serializer_create = ShoppingCartSerializer(
-            data={
-                'user': user_id,
-                'recipe': recipe_pk,
+    def after_create(self, recipe_ids):
+        """Сырой INSERT не отправляет post_save."""
+
+    def after_delete(self, recipe_ids):
+        """Сырой DELETE не отправляет post_delete."""
+
+    def post(self, request):
+        ids = self.get_ids(request)
+        with transaction.atomic():
+            found = set(Recipe.objects.filter(pk__in=ids).values_list(
+                'id', flat=True
+            ))
+            added = self.insert_relations(request.user, sorted(found))
+            if added:
+                self.after_create(added)
+        results = []
+        for recipe_id in ids:
+            if recipe_id not in found:
+                result = 'not_found'
+            elif recipe_id in added:
+                result = 'added'
+            else:
+                result = 'exists'
+            results.append({'id': recipe_id, 'status': result})
+        return Response({'results': results})
+
+    def delete(self, request):
+        ids = self.get_ids(request)
+        with transaction.atomic():
+            removed = self.delete_relations(request.user, ids)
+            if removed:
+                self.after_delete(removed)
+        return Response({'results': [
+            {
+                'id': recipe_id,
+                'status': 'removed' if recipe_id in removed else 'missing'
             }
-        )
-        serializer_create.is_valid(raise_exception=True)
-        serializer_create.save()
-        return Response(
-            serializer_create.data, status=status.HTTP_201_CREATED
-        )
+            for recipe_id in ids
+        ]})
 
-    def delete(self, request, recipe_pk):
-        get_object_or_404(Recipe, pk=recipe_pk)
-        user_id = request.user.id
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user_id,
-            recipe=recipe_pk
-        )
 
-        if not shopping_cart.exists():
-            return Response({
-                'error': 'рецепта нет в корзине'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        shopping_cart.delete()
+class FavoriteBulkView(BulkUserRecipeRelationView):
+    model = Favorite
+
+    def after_create(self, recipe_ids):
+        change_counters(Recipe, recipe_ids, 'favorites_count', 1)
+
+    def after_delete(self, recipe_ids):
+        change_counters(Recipe, recipe_ids, 'favorites_count', -1)
+
+
+class ShoppingCartBulkView(BulkUserRecipeRelationView):
+    model = ShoppingCart
+
+
+class ShoppingCartClearView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def delete(self, request):
+        ShoppingCart.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type=CONTENT_TYPE)
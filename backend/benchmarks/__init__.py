@@ -0,0 +1,4 @@
+"""Нагрузочные замеры API на синтетических данных.
+
+Запуск: python -m benchmarks.run --help
+"""
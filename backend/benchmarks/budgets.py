@@ -0,0 +1,290 @@
+"""Проверка бюджета SQL-запросов для маршрутов api/urls.py.
+
+Каждый запрос выполняется на двух наборах данных разного размера:
+число запросов не должно превышать бюджет и не должно зависеть от
+объёма данных. При нарушении печатается выполненный SQL, код выхода 1.
+
+Запуск: DB_ENGINE=django.db.backends.sqlite3 python -m benchmarks.budgets
+"""
+import base64
+import io
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Запросы считаются на соединении основного потока внутри откатываемой
+# транзакции, а асинхронные обёртки (api/async_views.py) выполняют те же
+# view в пуле потоков со своими соединениями.
+os.environ['ASYNC_VIEWS'] = 'False'
+
+# bulk_ids — число id в запросах к массовым эндпоинтам.
+DATASETS = (
+    {'users': 6, 'recipes_per_user': 3, 'ingredients_per_recipe': 3,
+     'favorites_per_user': 4, 'subscriptions_per_user': 3,
+     'cart_per_user': 4, 'bulk_ids': 2},
+    {'users': 30, 'recipes_per_user': 12, 'ingredients_per_recipe': 10,
+     'favorites_per_user': 25, 'subscriptions_per_user': 12,
+     'cart_per_user': 20, 'bulk_ids': 30},
+)
+PASSWORD = 'benchmark-password'
+
+# (название, метод, URL, тело запроса, бюджет запросов)
+BUDGETS = (
+    ('user-list', 'get', '/api/users/', None, 3),
+    ('user-me', 'get', '/api/users/me/', None, 1),
+    ('user-create', 'post', '/api/users/', {
+        'email': 'new@example.com', 'username': 'new_user',
+        'first_name': 'Имя', 'last_name': 'Фамилия', 'password': PASSWORD,
+    }, 5),
+    ('user-detail', 'get', '/api/users/{author_id}/', None, 1),
+    ('ingredient-list', 'get', '/api/ingredients/', None, 1),
+    ('ingredient-search', 'get',
+     '/api/ingredients/?name={ingredient_prefix}', None, 2),
+    ('ingredient-detail', 'get',
+     '/api/ingredients/{ingredient_id}/', None, 1),
+    ('tag-list', 'get', '/api/tags/', None, 1),
+    ('tag-detail', 'get', '/api/tags/{tag_id}/', None, 1),
+    ('recipe-list', 'get', '/api/recipes/?limit=6', None, 5),
+    ('recipe-list-large-page', 'get', '/api/recipes/?limit=50', None, 5),
+    ('recipe-list-cursor', 'get', '/api/recipes/?cursor=&limit=6', None, 4),
+    ('recipe-list-filtered', 'get',
+     '/api/recipes/?is_favorited=1&is_in_shopping_cart=0'
+     '&tags={tag_slug}&limit=6', None, 6),
+    ('recipe-list-all-tags', 'get',
+     '/api/recipes/?tags={tag_slug}&tags={other_tag_slug}&tags_match=all'
+     '&limit=6', None, 5),
+    ('recipe-list-author', 'get',
+     '/api/recipes/?author={author_id}&limit=6', None, 5),
+    ('recipe-detail', 'get', '/api/recipes/{recipe_id}/', None, 4),
+    ('recipe-detail-cached', 'get', '/api/recipes/{recipe_id}/', None, 1),
+    ('recipe-update', 'patch', '/api/recipes/{own_recipe_id}/',
+     {'name': 'Новое название'}, 9),
+    ('recipe-create', 'post', '/api/recipes/', '{recipe_body}', 12),
+    ('recipe-delete', 'delete', '/api/recipes/{deleted_recipe_id}/',
+     None, 12),
+    ('subscription-list', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', None, 3),
+    ('subscription-list-all-recipes', 'get',
+     '/api/users/subscriptions/', None, 3),
+    ('subscribe', 'post', '/api/users/{free_author_id}/subscribe/', None, 8),
+    ('unsubscribe', 'delete',
+     '/api/users/{free_author_id}/subscribe/', None, 5),
+    ('favorite-add', 'post',
+     '/api/recipes/{free_recipe_id}/favorite/', None, 5),
+    ('favorite-remove', 'delete',
+     '/api/recipes/{free_recipe_id}/favorite/', None, 3),
+    ('shopping_cart-add', 'post',
+     '/api/recipes/{free_recipe_id}/shopping_cart/', None, 4),
+    ('shopping_cart-remove', 'delete',
+     '/api/recipes/{free_recipe_id}/shopping_cart/', None, 1),
+    ('favorite-bulk-add', 'post', '/api/recipes/favorite/',
+     {'ids': '{free_recipe_ids}'}, 5),
+    ('favorite-bulk-remove', 'delete', '/api/recipes/favorite/',
+     {'ids': '{free_recipe_ids}'}, 4),
+    ('shopping_cart-bulk-add', 'post', '/api/recipes/shopping_cart/',
+     {'ids': '{free_recipe_ids}'}, 4),
+    ('shopping_cart-bulk-remove', 'delete', '/api/recipes/shopping_cart/',
+     {'ids': '{free_recipe_ids}'}, 3),
+    ('shopping_cart-download', 'get',
+     '/api/recipes/download_shopping_cart/', None, 1),
+    ('shopping_cart-clear', 'delete', '/api/recipes/shopping_cart/clear/',
+     None, 1),
+    ('metrics', 'get', '/api/metrics/', None, 0),
+    # Сохраняет пользователя и сбрасывает кеш токена, поэтому идёт в конце.
+    ('set-password', 'post', '/api/users/set_password/',
+     {'current_password': PASSWORD, 'new_password': PASSWORD}, 1),
+    ('token-login', 'post', '/api/auth/token/login/',
+     {'email': '{email}', 'password': PASSWORD}, 4),
+    # Удаляет токен клиента, поэтому идёт последним.
+    ('token-logout', 'post', '/api/auth/token/logout/', None, 3),
+)
+
+
+def image_data():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 120, 40)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def build_context(dataset, options):
+    from recipes.models import Ingredient, Recipe, Tag
+    from users.models import User
+
+    user = User.objects.get(auth_token__key=dataset['token'])
+    user.is_staff = True
+    user.set_password(PASSWORD)
+    user.save()
+    free_recipes = list(
+        Recipe.objects.exclude(author=user).exclude(
+            favorite_recipe__user=user
+        ).exclude(shopping_cart__user=user).values_list(
+            'id', flat=True
+        )[:options['bulk_ids'] + 1]
+    )
+    own_recipe_ids = list(
+        Recipe.objects.filter(author=user).values_list('id', flat=True)[:2]
+    )
+    tag, other_tag = Tag.objects.all()[:2]
+    ingredient_ids = Ingredient.objects.values_list('id', flat=True)
+    return {
+        **dataset,
+        'email': user.email,
+        'author_id': User.objects.exclude(pk=user.pk).first().pk,
+        'free_author_id': User.objects.exclude(pk=user.pk).exclude(
+            subscribed_to__subscriber=user
+        ).first().pk,
+        'ingredient_id': ingredient_ids[0],
+        'tag_id': tag.pk,
+        'tag_slug': tag.slug,
+        'other_tag_slug': other_tag.slug,
+        'own_recipe_id': own_recipe_ids[0],
+        'deleted_recipe_id': own_recipe_ids[1],
+        'free_recipe_id': free_recipes[0],
+        'free_recipe_ids': free_recipes[1:],
+        'recipe_body': {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image_data(),
+            'tags': [tag.pk, other_tag.pk],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredient_ids[
+                    :options['ingredients_per_recipe']
+                ]
+            ],
+        },
+    }
+
+
+def format_body(body, context):
+    if isinstance(body, str):
+        return context[body[1:-1]]
+    if body is None:
+        return None
+    return {
+        key: context[value[1:-1]] if isinstance(value, str)
+        and value.startswith('{') else value
+        for key, value in body.items()
+    }
+
+
+def count_queries(client, method, url, body):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(
+            url, data=json.dumps(body) if body is not None else None,
+            content_type='application/json'
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response.status_code, [query['sql'] for query in queries]
+
+
+def shared_caches(location):
+    """Файловый кеш, как в docker-compose: с ним включены все кеши."""
+    return {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': location,
+    }}
+
+
+@contextmanager
+def test_databases():
+    """Временная тестовая база, папки для медиафайлов и общего кеша."""
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment,
+        teardown_databases, teardown_test_environment,
+    )
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        with tempfile.TemporaryDirectory() as media_root, \
+                tempfile.TemporaryDirectory() as cache_location:
+            with override_settings(
+                MEDIA_ROOT=media_root, CACHES=shared_caches(cache_location)
+            ):
+                yield
+    finally:
+        teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def seeded_client(dataset_options):
+    """Клиент и контекст URL; данные откатываются после выхода."""
+    from django.core.cache import cache
+    from django.db import transaction
+    from django.test import Client
+
+    from benchmarks.dataset import build_dataset
+
+    cache.clear()
+    build_options = dict(dataset_options)
+    build_options.pop('bulk_ids')
+    with transaction.atomic():
+        context = build_context(
+            build_dataset(**build_options), dataset_options
+        )
+        yield Client(HTTP_AUTHORIZATION=f'Token {context["token"]}'), context
+        transaction.set_rollback(True)
+
+
+def measure_dataset(dataset_options):
+    results = {}
+    with seeded_client(dataset_options) as (client, context):
+        for name, method, url, body, _ in BUDGETS:
+            results[name] = count_queries(
+                client, method, url.format(**context),
+                format_body(body, context)
+            )
+    return results
+
+
+def check(runs):
+    failures = []
+    for name, _, _, _, budget in BUDGETS:
+        counts = [len(run[name][1]) for run in runs]
+        statuses = [run[name][0] for run in runs]
+        problems = []
+        if any(status >= 400 for status in statuses):
+            problems.append(f'статус ответа {statuses}')
+        if max(counts) > budget:
+            problems.append(f'запросов {max(counts)} при бюджете {budget}')
+        if len(set(counts)) > 1:
+            problems.append(f'число запросов растёт с данными: {counts}')
+        line = f'{name:32} {counts} / {budget}'
+        if problems:
+            failures.append(name)
+            print(f'FAIL {line}: {"; ".join(problems)}')
+            for query in runs[-1][name][1]:
+                print(f'    {query}')
+        else:
+            print(f'ok   {line}')
+    return failures
+
+
+def main():
+    django.setup()
+    with test_databases():
+        runs = [measure_dataset(options) for options in DATASETS]
+    failures = check(runs)
+    if failures:
+        print(f'Превышен бюджет запросов: {", ".join(failures)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import csv
+import io
+import os
+import random
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import recount
+from recipes.images import make_variants
+from recipes.models import (
+    Favorite, Ingredient, IngredientRecipe, Recipe, ShoppingCart,
+    Subscription, Tag
+)
+from users.models import User
+
+IMAGE_NAME = 'business_logic/images/benchmark.png'
+IMAGE_SIZE = (640, 480)
+
+
+def save_image():
+    """Кладёт общую картинку рецептов и её варианты в хранилище."""
+    field = Recipe._meta.get_field('image')
+    buffer = io.BytesIO()
+    Image.new('RGB', IMAGE_SIZE, (200, 120, 40)).save(buffer, 'PNG')
+    name = field.storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    make_variants(field.attr_class(None, field, name))
+    return name
+
+
+def load_ingredients(limit):
+    path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+    with open(path, 'r', encoding='utf-8') as csvfile:
+        rows = [row for row in csv.reader(csvfile) if row][:limit]
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit=unit) for name, unit in rows],
+        ignore_conflicts=True
+    )
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+def build_dataset(users=50, recipes_per_user=10, ingredients=500,
+                  ingredients_per_recipe=8, tags=5, favorites_per_user=20,
+                  subscriptions_per_user=10, cart_per_user=10, seed=0):
+    """Заполняет пустую базу и возвращает данные для запросов.
+
+    Объекты создаются через bulk_create, поэтому после загрузки
+    счётчики пересчитываются; поисковый вектор строит триггер.
+    """
+    rng = random.Random(seed)
+    image_name = save_image()
+    ingredient_ids = load_ingredients(ingredients)
+    Tag.objects.bulk_create([
+        Tag(name=f'Тег {index}', color=f'#{index:06x}', slug=f'tag-{index}')
+        for index in range(tags)
+    ])
+    User.objects.bulk_create([
+        User(
+            email=f'user{index}@example.com', username=f'user{index}',
+            first_name='Имя', last_name='Фамилия'
+        )
+        for index in range(users)
+    ])
+    # SQLite не возвращает первичные ключи из bulk_create.
+    tag_objects = list(Tag.objects.all())
+    user_objects = list(User.objects.order_by('id'))
+    Recipe.objects.bulk_create([
+        Recipe(
+            author=author, name=f'Рецепт {author.id}-{index}',
+            text='Описание рецепта ' * 10,
+            cooking_time=rng.randint(5, 120), image=image_name
+        )
+        for author in user_objects
+        for index in range(recipes_per_user)
+    ])
+    recipe_objects = list(Recipe.objects.only('id'))
+
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+        for recipe in recipe_objects
+        for tag in rng.sample(tag_objects, rng.randint(1, min(3, tags)))
+    ])
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(
+            recipe_id=recipe.pk, ingredient_id=ingredient_id,
+            amount=rng.randint(1, 500)
+        )
+        for recipe in recipe_objects
+        for ingredient_id in rng.sample(
+            ingredient_ids, min(ingredients_per_recipe, len(ingredient_ids))
+        )
+    ])
+    recipe_ids = [recipe.pk for recipe in recipe_objects]
+    for model, per_user in (
+        (Favorite, favorites_per_user), (ShoppingCart, cart_per_user)
+    ):
+        model.objects.bulk_create([
+            model(user=user, recipe_id=recipe_id)
+            for user in user_objects
+            for recipe_id in rng.sample(
+                recipe_ids, min(per_user, len(recipe_ids))
+            )
+        ])
+    Subscription.objects.bulk_create([
+        Subscription(subscriber=user, subscribed_to=author)
+        for user in user_objects
+        for author in rng.sample(
+            user_objects, min(subscriptions_per_user + 1, users)
+        )
+        if author != user
+    ][:users * subscriptions_per_user])
+
+    recount(User, Recipe, Favorite, Subscription)
+
+    user = user_objects[0]
+    return {
+        'token': Token.objects.create(user=user).key,
+        'recipe_id': recipe_ids[0],
+        'ingredient_prefix': Ingredient.objects.values_list(
+            'name', flat=True
+        ).first()[:2],
+    }
@@ -0,0 +1,179 @@
+"""Замер задержки, пропускной способности и числа SQL-запросов API.
+
+Данные создаются во временной тестовой базе (SQLite или PostgreSQL из
+настроек, например DB_ENGINE=django.db.backends.sqlite3), результаты
+выводятся в JSON. Два результата сравниваются ключом --compare.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+ENDPOINTS = (
+    ('recipe-list', '/api/recipes/?limit=6'),
+    ('recipe-list-large', '/api/recipes/?limit=50'),
+    ('recipe-list-cursor', '/api/recipes/?cursor=&limit=6'),
+    ('recipe-list-tags', '/api/recipes/?tags=tag-0&tags=tag-1&limit=6'),
+    ('recipe-detail', '/api/recipes/{recipe_id}/'),
+    ('subscription-list', '/api/users/subscriptions/?recipes_limit=3'),
+    ('shopping_cart-download', '/api/recipes/download_shopping_cart/'),
+    ('ingredient-search', '/api/ingredients/?name={ingredient_prefix}'),
+    ('tag-list', '/api/tags/'),
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def consume(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(client, url, iterations, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        consume(client.get(url))
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+        size = consume(response)
+    # captured_queries читается из журнала соединения, который
+    # очищается в начале каждого следующего запроса.
+    query_count = len(queries)
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request_started = time.perf_counter()
+        consume(client.get(url))
+        timings.append((time.perf_counter() - request_started) * 1000)
+    total = time.perf_counter() - started
+    return {
+        'url': url,
+        'status': response.status_code,
+        'bytes': size,
+        'queries': query_count,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'rps': round(iterations / total, 1),
+    }
+
+
+def run(options):
+    django.setup()
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment,
+        teardown_databases,
+    )
+    from django.test import Client
+
+    from benchmarks.dataset import build_dataset
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            started = time.perf_counter()
+            context = build_dataset(
+                users=options.users,
+                recipes_per_user=options.recipes_per_user,
+                ingredients=options.ingredients,
+                favorites_per_user=options.favorites_per_user,
+                subscriptions_per_user=options.subscriptions_per_user,
+                cart_per_user=options.cart_per_user,
+            )
+            seeded = time.perf_counter() - started
+            client = Client(HTTP_AUTHORIZATION=f'Token {context["token"]}')
+            results = {
+                name: measure(
+                    client, url.format(**context),
+                    options.iterations, options.warmup
+                )
+                for name, url in ENDPOINTS
+                if not options.only or name in options.only
+            }
+        from django.db import connection
+        return {
+            'database': connection.vendor,
+            'dataset': {
+                'users': options.users,
+                'recipes_per_user': options.recipes_per_user,
+                'ingredients': options.ingredients,
+                'favorites_per_user': options.favorites_per_user,
+                'subscriptions_per_user': options.subscriptions_per_user,
+                'cart_per_user': options.cart_per_user,
+                'seed_seconds': round(seeded, 2),
+            },
+            'iterations': options.iterations,
+            'endpoints': results,
+        }
+    finally:
+        teardown_databases(databases, verbosity=0)
+
+
+def compare(base_path, new_path):
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base = json.load(base_file)['endpoints']
+        new = json.load(new_file)['endpoints']
+    report = {}
+    for name in base.keys() & new.keys():
+        report[name] = {
+            metric: {
+                'base': base[name][metric],
+                'new': new[name][metric],
+                'change_pct': round(
+                    (new[name][metric] - base[name][metric])
+                    / base[name][metric] * 100, 1
+                ) if base[name][metric] else None,
+            }
+            for metric in ('p50_ms', 'p95_ms', 'rps', 'queries')
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--recipes-per-user', type=int, default=10)
+    parser.add_argument('--ingredients', type=int, default=500)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--subscriptions-per-user', type=int, default=10)
+    parser.add_argument('--cart-per-user', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument(
+        '--only', nargs='+', choices=[name for name, _ in ENDPOINTS],
+        help='Замерить только указанные эндпоинты.'
+    )
+    parser.add_argument('--output', help='Записать JSON в файл.')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('BASE', 'NEW'),
+        help='Сравнить два сохранённых результата.'
+    )
+    options = parser.parse_args(argv)
+    report = (
+        compare(*options.compare) if options.compare else run(options)
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Сравнение переключателей избранного, корзины и подписки под нагрузкой.
+
+Обращается по HTTP к уже запущенным серверам, например синхронному
+gunicorn (WSGI) и gunicorn с UvicornWorker и ASYNC_VIEWS=True (ASGI),
+работающим с одной базой. Каждый клиент по кругу добавляет и удаляет
+свой рецепт в избранном и корзине и подписывается на автора.
+
+  python -m benchmarks.toggles --token KEY \\
+      --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.run import percentile
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 10
+
+
+def toggle_urls(recipe_id, author_id):
+    return (
+        ('post', f'/api/recipes/{recipe_id}/favorite/', 201),
+        ('delete', f'/api/recipes/{recipe_id}/favorite/', 204),
+        ('post', f'/api/recipes/{recipe_id}/shopping_cart/', 201),
+        ('delete', f'/api/recipes/{recipe_id}/shopping_cart/', 204),
+        ('post', f'/api/users/{author_id}/subscribe/', 201),
+        ('delete', f'/api/users/{author_id}/subscribe/', 204),
+    )
+
+
+def fetch_targets(base_url, session, count):
+    """Пары (рецепт, автор) чужих рецептов разных авторов, ещё не
+    отмеченных пользователем."""
+    me = session.get(f'{base_url}/api/users/me/').json()['id']
+    recipes = session.get(
+        f'{base_url}/api/recipes/', params={'limit': 100}
+    ).json()['results']
+    subscribed = {
+        author['id'] for author in session.get(
+            f'{base_url}/api/users/subscriptions/', params={'limit': 100}
+        ).json()['results']
+    }
+    # У каждого клиента свой автор, иначе подписки конфликтуют.
+    targets = {}
+    for recipe in recipes:
+        author_id = recipe['author']['id']
+        if (
+            author_id != me and author_id not in subscribed
+            and author_id not in targets
+            and not recipe['is_favorited']
+            and not recipe['is_in_shopping_cart']
+        ):
+            targets[author_id] = recipe['id']
+    targets = [
+        (recipe_id, author_id) for author_id, recipe_id in targets.items()
+    ]
+    if len(targets) < count:
+        raise SystemExit(
+            f'Нужно {count} свободных рецептов, найдено {len(targets)}.'
+        )
+    return targets[:count]
+
+
+def client(base_url, token, urls, deadline, timings, errors, lock):
+    session = requests.Session()
+    session.headers['Authorization'] = f'Token {token}'
+    while time.monotonic() < deadline:
+        for method, url, expected in urls:
+            started = time.perf_counter()
+            response = session.request(method, base_url + url)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.append(elapsed)
+                if response.status_code != expected:
+                    errors.append(response.status_code)
+
+
+def bench(base_url, token, concurrency, duration):
+    session = requests.Session()
+    session.headers['Authorization'] = f'Token {token}'
+    targets = fetch_targets(base_url, session, concurrency)
+    timings, errors, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for recipe_id, author_id in targets:
+            executor.submit(
+                client, base_url, token, toggle_urls(recipe_id, author_id),
+                deadline, timings, errors, lock
+            )
+    total = time.perf_counter() - started
+    return {
+        'url': base_url,
+        'requests': len(timings),
+        'errors': len(errors),
+        'error_statuses': dict(Counter(errors)),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'rps': round(len(timings) / total, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        '--target', action='append', required=True,
+        help='Сервер в виде имя=URL; можно указать несколько раз.'
+    )
+    parser.add_argument('--token', required=True, help='Токен пользователя.')
+    parser.add_argument(
+        '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+        help='Число одновременных клиентов.'
+    )
+    parser.add_argument(
+        '--duration', type=float, default=DEFAULT_DURATION,
+        help='Длительность прогона на сервер, секунд.'
+    )
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    options = parser.parse_args(argv)
+
+    results = {}
+    for target in options.target:
+        name, _, base_url = target.partition('=')
+        results[name] = bench(
+            base_url.rstrip('/'), options.token, options.concurrency,
+            options.duration
+        )
+    print(f'{"":8} {"rps":>9} {"p50 мс":>9} {"p95 мс":>9} '
+          f'{"p99 мс":>9} {"ошибки":>7}')
+    for name, result in results.items():
+        print(f'{name:8} {result["rps"]:9} {result["p50_ms"]:9} '
+              f'{result["p95_ms"]:9} {result["p99_ms"]:9} '
+              f'{result["errors"]:7}')
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,25 @@ COLOR_CHARS_MAX_LENGTH = 7
 POSITIVE_SMALL_MIN_VALUE = 1
 POSITIVE_SMALL_MAX_VALUE = 32000
 MAX_LENGTH_VALUE = 150
+MAX_PAGE_SIZE = 100
+BULK_MAX_IDS = 100
+SEARCH_CONFIG = 'russian'
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+PAYLOAD_CACHE_SIZE = 256
+REFERENCE_CACHE_MAX_AGE = 60 * 60
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 360),
+}
+IMAGE_VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 85),
+    'webp': ('WEBP', 'webp', 80),
+}
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+METRICS_QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+METRICS_FLUSH_INTERVAL = 5
+AUTH_TOKEN_CACHE_SIZE = 1024
+AUTH_TOKEN_CACHE_TTL = 5 * 60
+LOCAL_VERSION_MAX_AGE = 30
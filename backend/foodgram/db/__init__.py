@@ -0,0 +1,17 @@
+from django.db import connections
+
+
+def close_unusable_connections(**kwargs):
+    """Проверка постоянных соединений в начале запроса.
+
+    Аналог CONN_HEALTH_CHECKS из Django 4.1: соединение, оборванное
+    сервером между запросами, закрывается до первого SQL-запроса, и
+    Django открывает новое вместо ошибки в обработчике.
+    """
+    for connection in connections.all():
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and connection.connection is not None
+            and not connection.is_usable()
+        ):
+            connection.close()
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Пул соединений с базой данных внутри процесса.
+
+    max_size ограничивает число открытых соединений, timeout — ожидание
+    свободного соединения, max_lifetime — возраст, после которого
+    соединение закрывается вместо возврата в пул.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=30, max_lifetime=3600):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created = {}
+        self.open = 0
+        self.in_use = 0
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def expired(self, connection):
+        created = self._created.get(id(connection), 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        self.open -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._condition:
+            self.requests += 1
+            while True:
+                while self._idle:
+                    connection = self._idle.pop()
+                    if connection.closed or self.expired(connection):
+                        self._discard(connection)
+                        continue
+                    self.in_use += 1
+                    self._record_wait(started)
+                    return connection
+                if self.open < self.max_size:
+                    self.open += 1
+                    self.in_use += 1
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self._record_wait(started)
+                    raise PoolTimeout(
+                        f'Нет свободного соединения за {self.timeout} с.'
+                    )
+                self._condition.wait(remaining)
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self.open -= 1
+                self.in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[id(connection)] = time.monotonic()
+            self._record_wait(started)
+        return connection
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.waits += 1
+            self.wait_time += waited
+
+    def release(self, connection, discard=False):
+        with self._condition:
+            self.in_use -= 1
+            if discard or connection.closed or self.expired(connection):
+                self._discard(connection)
+            else:
+                self._idle.append(connection)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'open': self.open,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'requests': self.requests,
+                'waits': self.waits,
+                'wait_seconds': self.wait_time,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, **options):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(connect, **options)
+        return _pools[alias]
+
+
+def pool_stats():
+    """Статистика пулов по алиасам баз данных."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
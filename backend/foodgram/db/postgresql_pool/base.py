@@ -0,0 +1,63 @@
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from ..pool import PoolTimeout, get_pool
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    Параметры пула берутся из ключа POOL настроек базы: max_size,
+    timeout, max_lifetime. Закрытие соединения возвращает его в пул.
+    """
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool = get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            **self.settings_dict.get('POOL', {})
+        )
+        # Каждая попытка может вернуть новое соединение, поэтому
+        # больше max_size + 1 попыток не нужно.
+        for _ in range(pool.max_size + 1):
+            try:
+                connection = pool.acquire()
+            except PoolTimeout as error:
+                raise Database.OperationalError(str(error)) from error
+            if (
+                not self.settings_dict.get('CONN_HEALTH_CHECKS')
+                or self.ping(connection)
+            ):
+                return connection
+            pool.release(connection, discard=True)
+        raise Database.OperationalError('Нет рабочих соединений в пуле.')
+
+    @staticmethod
+    def ping(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        discard = self.errors_occurred or bool(connection.closed)
+        if not discard and (
+            connection.get_transaction_status() != TRANSACTION_STATUS_IDLE
+        ):
+            try:
+                connection.rollback()
+            except Database.Error:
+                discard = True
+        self.pool.release(connection, discard=discard)
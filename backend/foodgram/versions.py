@@ -0,0 +1,53 @@
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from foodgram.constants import LOCAL_VERSION_MAX_AGE, REFERENCE_CACHE_MAX_AGE
+
+VERSION_KEY = 'model_version:{}'
+
+
+def cache_is_shared():
+    """Виден ли кеш Django всем процессам (файловый, memcached, Redis)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def version_max_age():
+    # Смену версии в другом процессе локальный кеш не увидит, поэтому
+    # версия в нём живёт недолго и устаревание ограничено этим сроком.
+    if cache_is_shared():
+        return REFERENCE_CACHE_MAX_AGE
+    return LOCAL_VERSION_MAX_AGE
+
+
+def version_key(model, pk=None):
+    key = VERSION_KEY.format(model._meta.label_lower)
+    if pk is not None:
+        key = f'{key}:{pk}'
+    return key
+
+
+def get_version(model, pk=None):
+    """Версия данных модели: время последнего изменения в наносекундах.
+
+    Хранится в кеше Django, поэтому при общем кеше (файловом, Redis)
+    одинакова для всех воркеров, веб-процессов и management-команд.
+    Версия живёт version_max_age(), чтобы изменения в обход ORM и в
+    других процессах при локальном кеше тоже становились видны.
+    С pk возвращает версию отдельного объекта.
+    """
+    key = version_key(model, pk)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, timeout=version_max_age())
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(sender, pk=None, **kwargs):
+    cache.set(
+        version_key(sender, pk), time.time_ns(), timeout=version_max_age()
+    )
@@ -1,9 +1,28 @@
 from django.contrib import admin
 
+from .images import build_variants
 from .models import Tag, Ingredient, Recipe, Subscription, User
 
+
+@admin.register(Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'author', 'favorites_count')
+    readonly_fields = ('favorites_count',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            build_variants(obj.image)
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = (
+        'username', 'email', 'recipes_count', 'subscribers_count'
+    )
+    readonly_fields = ('recipes_count', 'subscribers_count')
+
+
 admin.site.register(Tag)
 admin.site.register(Ingredient)
-admin.site.register(Recipe)
 admin.site.register(Subscription)
-admin.site.register(User)
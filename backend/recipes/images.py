@@ -0,0 +1,81 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from foodgram.timing import track
+from foodgram.constants import IMAGE_VARIANT_FORMATS, IMAGE_VARIANTS
+
+VARIANTS_DIR = 'variants'
+# Ошибки чтения и декодирования исходного изображения.
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(name, variant, image_format):
+    """Путь варианта изображения, вычисляемый из имени оригинала."""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    extension = IMAGE_VARIANT_FORMATS[image_format][1]
+    return os.path.join(
+        directory, VARIANTS_DIR, f'{stem}_{variant}.{extension}'
+    )
+
+
+def variant_urls(image):
+    """URL всех вариантов изображения: {вариант: {формат: url}}."""
+    return {
+        variant: {
+            image_format: image.storage.url(
+                variant_name(image.name, variant, image_format)
+            )
+            for image_format in IMAGE_VARIANT_FORMATS
+        }
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def variants_exist(image):
+    return all(
+        image.storage.exists(variant_name(image.name, variant, image_format))
+        for variant in IMAGE_VARIANTS
+        for image_format in IMAGE_VARIANT_FORMATS
+    )
+
+
+@track('image')
+def make_variants(image):
+    """Создаёт уменьшенные копии изображения в JPEG и WebP."""
+    storage = image.storage
+    with storage.open(image.name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original = original.convert('RGB')
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = ImageOps.fit(original, size, Image.Resampling.LANCZOS)
+        for image_format, (pil_format, _, quality) in (
+            IMAGE_VARIANT_FORMATS.items()
+        ):
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, quality=quality, optimize=True)
+            name = variant_name(image.name, variant, image_format)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(image):
+    """Создаёт варианты только что загруженного изображения.
+
+    Ошибка не мешает сохранению рецепта: она пишется в лог, а
+    недостающие варианты досоздаёт команда make_image_variants.
+    """
+    try:
+        make_variants(image)
+    except IMAGE_ERRORS as error:
+        logger.warning(
+            'Не удалось создать варианты изображения %s: %s',
+            image.name, error
+        )
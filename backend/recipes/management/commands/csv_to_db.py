@@ -1,24 +1,128 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from foodgram.versions import bump_version
 from recipes.models import Ingredient
 from foodgram.settings import BASE_DIR
 
+DEFAULT_BATCH_SIZE = 1000
+
 
 class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV (name,measurement_unit) или JSON '
+        'пачками. Уже существующие ингредиенты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу .csv или .json.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной вставке.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать файл без записи в базу.'
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать через COPY (только PostgreSQL).'
+        )
+
+    def read_csv(self, path):
+        with open(path, 'r', encoding='utf-8') as csvfile:
+            for row in csv.reader(csvfile):
+                if row:
+                    yield row[0], row[1]
+
+    def read_json(self, path):
+        with open(path, 'r', encoding='utf-8') as jsonfile:
+            for item in json.load(jsonfile):
+                yield item['name'], item['measurement_unit']
+
+    def read_rows(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            return self.read_csv(path)
+        if extension == '.json':
+            return self.read_json(path)
+        raise CommandError(f'Неподдерживаемый формат файла: {path}')
+
+    def batches(self, rows, batch_size):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def insert_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ],
+            ignore_conflicts=True
+        )
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DELETE ROWS'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+            )
 
     def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL.')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        write_batch = (
+            self.copy_batch if options['copy'] else self.insert_batch
+        )
+
+        count_before = Ingredient.objects.count()
+        processed = 0
+        started = time.perf_counter()
+        for batch in self.batches(self.read_rows(path), batch_size):
+            if not options['dry_run']:
+                write_batch(batch)
+            processed += len(batch)
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - count_before
+        if created:
+            # bulk_create и COPY не отправляют post_save.
+            bump_version(Ingredient)
 
-        with open(os.path.join(
-            BASE_DIR, 'data', 'ingredients.csv'
-        ), 'r', encoding='utf-8') as csvfile:
-            dict_reader = csv.reader(csvfile)
-            for row in dict_reader:
-                ingredient, created = Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1],
-                )
-                if created:
-                    ingredient.save()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, добавлено: {created}, '
+            f'{processed / elapsed if elapsed else processed:.0f} строк/с.'
+        ))
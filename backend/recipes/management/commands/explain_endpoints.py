@@ -0,0 +1,126 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.budgets import (
+    BUDGETS, DATASETS, count_queries, seeded_client, test_databases
+)
+
+DEFAULT_USERS = 200
+DEFAULT_MIN_ROWS = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит тестовую базу, выполняет EXPLAIN для SQL каждого '
+        'GET-эндпоинта и отмечает последовательные сканирования '
+        'больших таблиц. На PostgreSQL — EXPLAIN (ANALYZE, BUFFERS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=DEFAULT_USERS,
+            help='Число пользователей в тестовых данных.'
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+            help='Сканирование таблиц меньшего размера не отмечается.'
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Печатать планы запросов целиком.'
+        )
+
+    def handle(self, *args, **options):
+        flagged = 0
+        dataset_options = self.dataset_options(options['users'])
+        with test_databases(), seeded_client(dataset_options) \
+                as (client, context):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            sizes = self.table_sizes()
+            for name, method, url, _, _ in BUDGETS:
+                if method != 'get':
+                    continue
+                _, queries = count_queries(
+                    client, method, url.format(**context), None
+                )
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                for sql in dict.fromkeys(queries):
+                    if not sql.lstrip().upper().startswith(
+                        ('SELECT', 'WITH')
+                    ):
+                        continue
+                    plan, scans = self.explain(sql)
+                    scans = [
+                        scan for scan in scans
+                        if sizes.get(scan, 0) >= options['min_rows']
+                    ]
+                    flagged += len(scans)
+                    self.stdout.write(f'  {sql[:120]}')
+                    if options['plans']:
+                        self.stdout.write(plan)
+                    for table in scans:
+                        self.stdout.write(self.style.WARNING(
+                            f'    Seq Scan: {table} ({sizes[table]} строк)'
+                        ))
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Последовательных сканирований: {flagged}.'
+        ))
+
+    def dataset_options(self, users):
+        """Параметры самого большого набора бюджетов, рассчитанного на
+        такое число пользователей, с заданным числом пользователей."""
+        suitable = [
+            dataset for dataset in DATASETS if dataset['users'] <= users
+        ]
+        if not suitable:
+            raise CommandError(
+                f'Нужно не меньше {DATASETS[0]["users"]} пользователей.'
+            )
+        return {**suitable[-1], 'users': users}
+
+    def table_sizes(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT relname, reltuples::bigint FROM pg_class "
+                    "WHERE relkind = 'r'"
+                )
+                return dict(cursor.fetchall())
+            sizes = {}
+            for table in connection.introspection.table_names(cursor):
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM '
+                    f'{connection.ops.quote_name(table)}'
+                )
+                sizes[table] = cursor.fetchone()[0]
+            return sizes
+
+    def explain(self, sql):
+        """Текст плана и таблицы, читаемые последовательно."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}'
+                )
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return json.dumps(plan, indent=2), list(
+                    self.pg_seq_scans(plan[0]['Plan'])
+                )
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        return '\n'.join(details), [
+            detail.split()[1] for detail in details
+            if detail.startswith('SCAN ') and ' USING ' not in detail
+        ]
+
+    def pg_seq_scans(self, node):
+        if node['Node Type'] == 'Seq Scan':
+            yield node['Relation Name']
+        for child in node.get('Plans', ()):
+            yield from self.pg_seq_scans(child)
@@ -0,0 +1,67 @@
+import os
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.images import VARIANTS_DIR
+from recipes.models import Recipe
+
+DEFAULT_MIN_AGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет изображения рецептов и их варианты, на которые не '
+        'ссылается ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=DEFAULT_MIN_AGE,
+            help='Не трогать файлы моложе указанного числа секунд.'
+        )
+
+    def unreferenced(self, storage, directory, referenced, cutoff):
+        if not storage.exists(directory):
+            return
+        _, files = storage.listdir(directory)
+        for filename in files:
+            name = os.path.join(directory, filename)
+            stem = os.path.splitext(filename)[0]
+            if os.path.basename(directory) == VARIANTS_DIR:
+                stem = stem.rsplit('_', 1)[0]
+            if stem in referenced:
+                continue
+            if storage.get_modified_time(name).timestamp() > cutoff:
+                continue
+            yield name
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+        referenced = {
+            os.path.splitext(os.path.basename(name))[0]
+            for name in Recipe.objects.exclude(image='').values_list(
+                'image', flat=True
+            ).iterator()
+        }
+        cutoff = time.time() - options['min_age']
+        removed = 0
+        for path in (directory, os.path.join(directory, VARIANTS_DIR)):
+            for name in self.unreferenced(
+                storage, path, referenced, cutoff
+            ):
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+                removed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Неиспользуемых файлов: {removed}'
+            f'{" (не удалены)" if options["dry_run"] else ""}.'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+
+from recipes.images import IMAGE_ERRORS, make_variants, variants_exist
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии изображений существующих рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие варианты.'
+        )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        recipes = Recipe.objects.exclude(image='').only('id', 'image')
+        for recipe in recipes.iterator():
+            if not options['force'] and variants_exist(recipe.image):
+                continue
+            try:
+                make_variants(recipe.image)
+            except IMAGE_ERRORS as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+                continue
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {created}, с ошибками: {failed}.'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+from recipes.models import Favorite, Recipe, Subscription
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, рецептов и подписчиков '
+        'по фактическим данным.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(User, Recipe, Favorite, Subscription)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
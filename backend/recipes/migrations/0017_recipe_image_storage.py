@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:02
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, storage=recipes.storage.ContentHashStorage(), upload_to='business_logic/images/', verbose_name='Изображение'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import (
     RegexValidator, MinValueValidator, MaxValueValidator)
@@ -6,6 +8,7 @@ from foodgram.constants import (
     CHARFIELD_MAX_LENGTH, COLOR_CHARS_MAX_LENGTH, POSITIVE_SMALL_MIN_VALUE,
     POSITIVE_SMALL_MAX_VALUE
 )
+from .storage import ContentHashStorage
 from users.models import User
 
 
@@ -80,9 +83,30 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
         upload_to='business_logic/images/',
+        storage=ContentHashStorage(),
         default=None,
     )
     published_at = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном'
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='recipe_search_vector'),
+            GinIndex(
+                fields=['name'], name='recipe_name_trgm',
+                opclasses=['gin_trgm_ops']
+            ),
+            models.Index(
+                fields=['-published_at', '-id'], name='recipe_published_idx'
+            ),
+            models.Index(
+                fields=['author', '-published_at', '-id'],
+                name='recipe_author_published_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -109,6 +133,16 @@ class IngredientRecipe(models.Model):
         ]
     )
 
+    class Meta:
+        indexes = [
+            # Список покупок суммирует amount по рецептам без чтения
+            # строк таблицы (include поддерживает только PostgreSQL).
+            models.Index(
+                fields=['recipe', 'ingredient'], include=['amount'],
+                name='ingredientrecipe_recipe_idx'
+            ),
+        ]
+
     def __str__(self) -> str:
         return f'{self.ingredient} {self.recipe}'
 
@@ -160,5 +194,13 @@ class ShoppingCart(models.Model):
         Recipe, on_delete=models.CASCADE, related_name='shopping_cart'
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart'
+            )
+        ]
+
     def __str__(self) -> str:
         return f'{self.user} {self.recipe}'
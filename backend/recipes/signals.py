@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+
+from users.models import User
+from .counters import change_counter
+from .models import Favorite, Recipe, Subscription
+
+COUNTERS = (
+    (Recipe, User, 'author_id', 'recipes_count'),
+    (Favorite, Recipe, 'recipe_id', 'favorites_count'),
+    (Subscription, User, 'subscribed_to_id', 'subscribers_count'),
+)
+
+
+def make_receivers(target, attribute, field):
+    def created(sender, instance, created, **kwargs):
+        if created:
+            change_counter(target, getattr(instance, attribute), field, 1)
+
+    def deleted(sender, instance, **kwargs):
+        change_counter(target, getattr(instance, attribute), field, -1)
+
+    return created, deleted
+
+
+def connect_signals():
+    for sender, target, attribute, field in COUNTERS:
+        created, deleted = make_receivers(target, attribute, field)
+        post_save.connect(
+            created, sender=sender, weak=False,
+            dispatch_uid=f'{field}_{sender._meta.model_name}_save'
+        )
+        post_delete.connect(
+            deleted, sender=sender, weak=False,
+            dispatch_uid=f'{field}_{sender._meta.model_name}_delete'
+        )
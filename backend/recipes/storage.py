@@ -0,0 +1,40 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .images import VARIANTS_DIR
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 их содержимого.
+
+    Одинаковые загрузки сохраняются один раз, а содержимое файла по
+    заданному URL никогда не меняется. Варианты изображений уже названы
+    по хешу оригинала и сохраняются под своими именами.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, f'{digest.hexdigest()}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if os.path.basename(os.path.dirname(name)) != VARIANTS_DIR:
+            name = self.content_name(name, content)
+            if self.exists(name):
+                # gc_media не удаляет свежие файлы: повторная загрузка
+                # старого осиротевшего файла продлевает ему жизнь.
+                os.utime(self.path(name))
+                return name
+        return super().save(name, content, max_length=max_length)
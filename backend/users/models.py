@@ -31,6 +31,12 @@ class User(AbstractUser):
         max_length=MAX_LENGTH_VALUE,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество подписчиков'
+    )
 
     class Meta:
         ordering = ['username']